@@ -1,6 +1,8 @@
 import io
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from pyarrow import csv as pa_csv
 import streamlit as st
 
 st.set_page_config(page_title="Permit Lead Finder — CSV/XLSX", layout="wide")
@@ -8,41 +10,116 @@ st.title("Permit Lead Finder — CSV/XLSX")
 st.caption("Upload a CSV or Excel, filter, and download outreach-ready leads.")
 
 # ---------- helpers ----------
+# known permits_clean_v3 columns: IDs, ZIPs and dates stay text (keeps leading zeros),
+# low-cardinality ones are categorical; anything else is inferred
+TEXT = "string[pyarrow]"
+DTYPES = {
+    "Permit #": TEXT, "County": "category", "City": "category", "ZIP": TEXT,
+    "Status": "category", "Permit Type": "category", "Project Description": TEXT,
+    "Issue Date": TEXT, "Expiration Date": TEXT, "Owner Name": TEXT, "Owner Phone": TEXT,
+    "Owner Email": TEXT, "Contractor": TEXT, "Contractor License": TEXT,
+}
+# xlsx date cells are real dates, not the export's text; leave them to the reader
+XLSX_DTYPES = {c: t for c, t in DTYPES.items() if c not in ("Issue Date", "Expiration Date")}
+
+def read_csv_fast(raw, dtype):
+    def parse(names, as_text):
+        opts = pa_csv.ConvertOptions(column_types=as_text, strings_can_be_null=True)
+        return pa_csv.read_csv(io.BytesIO(raw), pa_csv.ReadOptions(column_names=names, skip_rows=1), convert_options=opts)
+
+    try:
+        # multi-threaded Arrow parser. Declared text/category columns are read as strings
+        # at parse time; pandas' engine="pyarrow" only casts afterwards, which turns a
+        # ZIP of 01234 into 1234. Header names come from pandas so duplicate and blank
+        # headers get its "X.1" / "Unnamed: N" labels.
+        names = list(pd.read_csv(io.BytesIO(raw), nrows=0).columns)
+        as_text = {c: pa.string() for c, t in dtype.items() if t in (TEXT, "category")}
+        tbl = parse(names, as_text)
+        # Arrow infers ISO dates/times; keep those as the file's text, like pandas does
+        temporal = {f.name: pa.string() for f in tbl.schema if pa.types.is_temporal(f.type)}
+        if temporal:
+            tbl = parse(names, {**as_text, **temporal})
+        d = tbl.to_pandas(types_mapper=pd.ArrowDtype)
+        return d.astype({c: t for c, t in dtype.items() if c in d.columns})
+    except ValueError:
+        # rows the Arrow parser rejects (e.g. ragged lines); the C engine is more lenient
+        return pd.read_csv(io.BytesIO(raw), dtype=dtype, dtype_backend="pyarrow")
+
+def read_excel_fast(raw, **kw):
+    try:
+        # Rust-backed streaming reader; far quicker than openpyxl's XML DOM
+        return pd.read_excel(io.BytesIO(raw), engine="calamine", dtype_backend="pyarrow", **kw)
+    except ImportError:
+        return pd.read_excel(io.BytesIO(raw), dtype_backend="pyarrow", **kw)
+
 @st.cache_data
-def read_any(file):
-    name = file.name.lower()
-    if name.endswith(".csv"):
-        return pd.read_csv(file)
-    return pd.read_excel(file)
+def read_any(raw, name):
+    # keyed on the upload's bytes, so widget reruns reuse the parsed frame
+    if name.lower().endswith(".csv"):
+        return read_csv_fast(raw, DTYPES)
+    return read_excel_fast(raw, dtype=XLSX_DTYPES)
+
+@st.cache_data
+def search_blob(raw, name):
+    # every column joined into one lowercased string per row, built once per upload.
+    # Keyed on the bytes: st.cache_data only samples large frames when hashing them.
+    d = read_any(raw, name)
+    cols = [d[c].astype(TEXT).fillna("") for c in d.columns]
+    if not cols:
+        return pd.Series("", index=d.index, dtype=TEXT)
+    return cols[0].str.cat(cols[1:], sep="\x1f").str.lower()
+
+def search(raw, name, query):
+    d = read_any(raw, name)
+    if not query:
+        return d
+    # plain ndarray mask: no index alignment when slicing
+    mask = search_blob(raw, name).str.contains(query.lower(), regex=False, na=False).to_numpy(dtype=bool)
+    return d[mask]
+
+@st.cache_data
+def to_csv_bytes(raw, name, query):
+    # write encoded chunks straight into the buffer instead of one big str
+    buf = io.BytesIO()
+    search(raw, name, query).to_csv(buf, index=False, encoding="utf-8", chunksize=50_000)
+    return buf.getvalue()
+
+@st.cache_data
+def to_xlsx_bytes(raw, name, query):
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="xlsxwriter") as w:
+        search(raw, name, query).to_excel(w, index=False, sheet_name = "Sheet1")
+        w.sheets["Sheet1"].freeze_panes(1,0)
+    return buf.getvalue()
 
 up = st.file_uploader("Upload CSV or Excel", type=["csv","xlsx"])
 if not up:
     st.info("Upload permits_clean_v3.csv or .xlsx to begin.")
     st.stop()
 
-df = read_any(up)
+raw = up.getvalue()
 st.subheader("Preview of Data")
-st.dataframe(df.head(20), use_container_width=True)
+st.dataframe(read_any(raw, up.name).head(20), use_container_width=True)
 
 st.subheader("Filters")
 query = st.text_input("Search any text (any column)")
-if query:
-    mask = df.astype(str).apply(lambda s: s.str.contains(query, case=False, na=False))
-    df = df[mask.any(axis=1)]
+df = search(raw, up.name, query)
 
 st.write(f"Rows after filters: {len(df)}")
-st.dataframe(df, use_container_width=True)
-
-@st.cache_data
-def to_csv_bytes(d): return d.to_csv(index=False).encode("utf-8")
-
-@st.cache_data
-def to_xlsx_bytes(d):
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as w:
-        d.to_excel(w, index=False, sheet_name = "Sheet1")
-        w.sheets["Sheet1"].freeze_panes(1,0)
-    return buf.getvalue()
+# only ship a slice to the browser; the downloads still carry every row
+n_preview = int(st.number_input("Rows to preview", min_value=100, value=500, step=100))
+st.dataframe(df.head(n_preview), use_container_width=True)
+if len(df) > n_preview:
+    st.caption(f"Showing the first {n_preview} rows. Click \"Prepare downloads\" below for the full results.")
 
-st.download_button("Download CSV", to_csv_byets(df), "permits_filtered.csv", "text/csv")
-st.download_button("Download Excel", to_xlsx_byets(df), "permits_filtered.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+# exports are only serialized on request, not on every filter rerun. st.button is only
+# True for one rerun (and clicking a download reruns), so remember the request until
+# the upload or the search changes.
+dl_for = (up.file_id, query)
+if st.session_state.get("downloads_for") != dl_for:
+    st.session_state.pop("downloads_for", None)
+if st.button("Prepare downloads"):
+    st.session_state["downloads_for"] = dl_for
+if "downloads_for" in st.session_state:
+    st.download_button("Download CSV", to_csv_bytes(raw, up.name, query), "permits_filtered.csv", "text/csv")
+    st.download_button("Download Excel", to_xlsx_bytes(raw, up.name, query), "permits_filtered.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")